@@ -1,30 +1,67 @@
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
-from flask import Flask, request, jsonify
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+import tiktoken
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 
-from config import Config
-from models.chat_models import ChatRequest, ChatResponse, SystemStatus, ChatMode
+from config import CONFIG
+from models.chat_models import ChatRequest, ChatResponse, SystemStatus, ChatMode, DocumentSource
 from services.document_service import DocumentService
 from services.rag_service import RAGService
-from utils.text_processing import validate_input
+from services.query_cache import QueryCache
+from utils.text_processing import validate_input, normalize_text
+from utils.json_provider import OrjsonProvider
+
+def setup_logging(log_file: bool = True) -> logging.handlers.QueueListener:
+    """
+    Route log records through a queue so request threads never block on I/O.
+    
+    Args:
+        log_file: Also write the rotating log file; only one process may own it,
+            so forked workers log to stdout alone
+    
+    Returns:
+        The started listener writing to stdout and, optionally, the rotating log file
+    """
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            'chatbot.log', maxBytes=10_000_000, backupCount=3, delay=True
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    # The listener's handlers do the formatting; the queue side passes the bare
+    # message through (prepare() bakes the formatted text into record.msg)
+    queue_handler = logging.handlers.QueueHandler(queue.Queue(-1))
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler], force=True)
+    
+    listener = logging.handlers.QueueListener(
+        queue_handler.queue, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('chatbot.log')
-    ]
-)
+log_listener = setup_logging()
 
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
-app.secret_key = Config.SECRET_KEY
+app.secret_key = CONFIG.SECRET_KEY
 
 # Global services
 document_service: DocumentService = None
@@ -32,48 +69,105 @@ rag_service: RAGService = None
 system_ready = False
 initialization_error = None
 
+# Initialization progress, reported by /api/status
+initializing = False
+docs_loaded = False
+chunks_ready = False
+vector_store_ready = False
+_init_lock = threading.RLock()
+
+# Reinitializing reloads only the current process and rewrites the shared vector
+# store, so it is switched off in multi-process servers (see gunicorn.conf.py)
+reinitialize_enabled = True
+
+# Generated responses keyed on (normalized message, context); entries never expire
+_response_cache = QueryCache(max_size=CONFIG.RESPONSE_CACHE_SIZE, ttl_seconds=float('inf'))
+
+def _generate(message: str, context: str = "") -> Tuple[str, ChatMode]:
+    """
+    Generate a response, serving repeated questions from the cache.
+    
+    Only the cache key is normalized; the LLM gets the message as written,
+    line breaks included. Failed generations are not cached.
+    """
+    cache_key = (normalize_text(message), context)
+    cached = _response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    response_text, mode = rag_service.generate_response(message, context)
+    if mode != ChatMode.UNAVAILABLE:
+        _response_cache.put(cache_key, (response_text, mode))
+    return response_text, mode
+
+def clear_caches():
+    """Drop cached responses (retrieval results are cached by RAGService)"""
+    _response_cache.clear()
+
 def initialize_system():
-    """Initialize the complete system"""
+    """Initialize the complete system (safe to run from a background thread)"""
+    global initializing
+    
+    with _init_lock:
+        initializing = True
+        try:
+            return _run_initialization()
+        finally:
+            initializing = False
+
+def _run_initialization():
+    """Run the initialization steps, recording progress as they complete"""
     global document_service, rag_service, system_ready, initialization_error
+    global docs_loaded, chunks_ready, vector_store_ready
     
     logger.info("=== Starting system initialization ===")
     
+    docs_loaded = chunks_ready = vector_store_ready = False
+    
     # Validate configuration
-    config_error = Config.validate()
+    config_error = CONFIG.validate()
     if config_error:
         initialization_error = config_error
         logger.error(f"Configuration validation failed: {config_error}")
         return False
     
+    # Chunking and context budgets need the tokenizer; without it nothing can be indexed
+    try:
+        tiktoken.get_encoding(CONFIG.TOKENIZER_ENCODING)
+    except Exception as e:
+        initialization_error = (f"Tokenizer encoding '{CONFIG.TOKENIZER_ENCODING}' unavailable "
+                                f"(download it into {CONFIG.TIKTOKEN_CACHE_DIR}): {e}")
+        logger.error(initialization_error)
+        return False
+    
     try:
         # Initialize services
         document_service = DocumentService()
         rag_service = RAGService()
         
-        # Initialize LLM first (most critical)
-        llm_success, llm_error = rag_service.initialize_llm()
+        # Initialize the LLM and embedding model in the background while documents load
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-init") as executor:
+            models_future = executor.submit(rag_service.initialize_all)
+            
+            # Load and chunk documents
+            doc_success, doc_error = document_service.load_documents()
+            docs_loaded = document_service.document_count > 0
+            chunks_ready = bool(document_service.get_chunks())
+            
+            (llm_success, llm_error), (embed_success, embed_error) = models_future.result()
+        
+        # The LLM is the most critical component
         if not llm_success:
             initialization_error = f"LLM initialization failed: {llm_error}"
             logger.error(initialization_error)
             return False
         
-        # Load documents
-        doc_success, doc_error = document_service.load_documents()
         if not doc_success:
             logger.warning(f"Document loading failed: {doc_error}")
             # Continue without documents (LLM-only mode)
             system_ready = True
             return True
         
-        # Create chunks
-        chunk_success, chunk_error = document_service.create_chunks()
-        if not chunk_success:
-            logger.warning(f"Chunk creation failed: {chunk_error}")
-            system_ready = True
-            return True
-        
-        # Initialize embedding model
-        embed_success, embed_error = rag_service.initialize_embedding_model()
         if not embed_success:
             logger.warning(f"Embedding model failed: {embed_error}")
             system_ready = True
@@ -88,6 +182,7 @@ def initialize_system():
             system_ready = True
             return True
         
+        vector_store_ready = True
         system_ready = True
         
         if rag_service.is_rag_ready():
@@ -107,13 +202,22 @@ def api_status():
     """Get system status"""
     try:
         if not system_ready or not rag_service:
+            if initializing:
+                error, message = None, "System initializing"
+            else:
+                error, message = initialization_error or "System not initialized", "System not ready"
+            
             status = SystemStatus(
                 rag_pipeline_ready=False,
                 llm_ready=False,
                 db_ready=False,
                 loaded_documents=[],
-                initialization_error=initialization_error or "System not initialized",
-                message="System not ready"
+                initialization_error=error,
+                message=message,
+                initializing=initializing,
+                docs_loaded=docs_loaded,
+                chunks_ready=chunks_ready,
+                vector_store_ready=vector_store_ready
             )
         else:
             loaded_docs = document_service.get_loaded_filenames() if document_service else []
@@ -131,7 +235,11 @@ def api_status():
                 db_ready=rag_service.is_rag_ready(),
                 loaded_documents=loaded_docs,
                 initialization_error=initialization_error,
-                message=message
+                message=message,
+                initializing=initializing,
+                docs_loaded=docs_loaded,
+                chunks_ready=chunks_ready,
+                vector_store_ready=vector_store_ready
             )
         
         return jsonify(status.to_dict())
@@ -140,6 +248,40 @@ def api_status():
         logger.error(f"Error in status endpoint: {e}")
         return jsonify({"error": "Status check failed"}), 500
 
+def _unavailable_response():
+    """Return the 503 response when chat cannot be served yet, else None"""
+    if system_ready and rag_service and rag_service.is_available():
+        return None
+    
+    if initializing:
+        return jsonify({
+            "error": "System unavailable",
+            "details": "System initializing"
+        }), 503, {"Retry-After": str(CONFIG.INIT_RETRY_AFTER)}
+    
+    error_msg = initialization_error or "System not ready"
+    return jsonify({
+        "error": "System unavailable",
+        "details": error_msg
+    }), 503
+
+def _retrieve_context(message: str, k_context: int) -> Tuple[str, List[DocumentSource], str]:
+    """Retrieve document context for a message, returning (context, sources, context_info)"""
+    if not rag_service.is_rag_ready():
+        return "", [], "LLM-only mode (no documents available)"
+    
+    context, sources = rag_service.search_similar_documents(message, k_context)
+    if not context:
+        # Fallback to LLM-only if no context found
+        return "", [], "No relevant documents found, using LLM-only mode"
+    
+    return context, sources, f"Used {len(sources)} document sources"
+
+def _sse_event(data, event: Optional[str] = None) -> str:
+    """Format one server-sent event with a JSON payload"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {app.json.dumps(data)}\n\n"
+
 @app.route('/api/chat', methods=['POST'])
 def api_chat():
     """Handle chat requests"""
@@ -149,12 +291,9 @@ def api_chat():
             return jsonify({"error": "Request must be JSON"}), 400
         
         # Check system readiness
-        if not system_ready or not rag_service or not rag_service.is_available():
-            error_msg = initialization_error or "System not ready"
-            return jsonify({
-                "error": "System unavailable",
-                "details": error_msg
-            }), 503
+        unavailable = _unavailable_response()
+        if unavailable:
+            return unavailable
         
         # Parse request
         try:
@@ -165,31 +304,10 @@ def api_chat():
         logger.info(f"Processing chat request: '{chat_request.message[:50]}...'")
         
         # Determine processing mode
-        k_context = chat_request.k_context or Config.DEFAULT_K_RETRIEVAL
+        k_context = chat_request.k_context or CONFIG.DEFAULT_K_RETRIEVAL
         
-        if rag_service.is_rag_ready():
-            # RAG mode
-            context, sources = rag_service.search_similar_documents(
-                chat_request.message, k_context
-            )
-            
-            if context:
-                response_text, mode = rag_service.generate_response(
-                    chat_request.message, context
-                )
-                context_info = f"Used {len(sources)} document sources"
-            else:
-                # Fallback to LLM-only if no context found
-                response_text, mode = rag_service.generate_response(
-                    chat_request.message
-                )
-                sources = []
-                context_info = "No relevant documents found, using LLM-only mode"
-        else:
-            # LLM-only mode
-            response_text, mode = rag_service.generate_response(chat_request.message)
-            sources = []
-            context_info = "LLM-only mode (no documents available)"
+        context, sources, context_info = _retrieve_context(chat_request.message, k_context)
+        response_text, mode = _generate(chat_request.message, context)
         
         # Create response
         chat_response = ChatResponse(
@@ -210,26 +328,97 @@ def api_chat():
             "details": "Internal server error"
         }), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def api_chat_stream():
+    """
+    Handle chat requests, streaming the response as server-sent events.
+    
+    Emits a 'sources' event, then one data event per text piece, then a
+    'done' event carrying the final mode.
+    """
+    try:
+        # Validate request
+        if not request.is_json:
+            return jsonify({"error": "Request must be JSON"}), 400
+        
+        # Check system readiness
+        unavailable = _unavailable_response()
+        if unavailable:
+            return unavailable
+        
+        # Parse request
+        try:
+            chat_request = ChatRequest.from_dict(request.get_json())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        logger.info(f"Processing streaming chat request: '{chat_request.message[:50]}...'")
+        
+        k_context = chat_request.k_context or CONFIG.DEFAULT_K_RETRIEVAL
+        
+        # Retrieve before streaming starts so search errors still get a proper status
+        context, sources, context_info = _retrieve_context(chat_request.message, k_context)
+        service = rag_service
+        
+        def events() -> Iterator[str]:
+            yield _sse_event({
+                'question': chat_request.message,
+                'context_provided_to_llm': context_info,
+                'sources': [
+                    {'source_file': src.source_file, 'page': src.page, 'score': src.score}
+                    for src in sources
+                ]
+            }, event='sources')
+            
+            mode = ChatMode.UNAVAILABLE
+            for piece, mode in service.generate_response_stream(chat_request.message, context):
+                yield _sse_event({'response': piece})
+            
+            logger.info(f"Response streamed in {mode.value} mode")
+            yield _sse_event({'mode': mode.value}, event='done')
+        
+        return Response(events(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in chat stream endpoint: {e}", exc_info=True)
+        return jsonify({
+            "error": "Chat processing failed",
+            "details": "Internal server error"
+        }), 500
+
 @app.route('/api/reinitialize', methods=['POST'])
 def api_reinitialize():
     """Reinitialize the system"""
+    if not reinitialize_enabled:
+        return jsonify({
+            "error": "Reinitialization disabled",
+            "details": "Running with several worker processes; restart the server to reload documents"
+        }), 409
+    
     try:
         logger.info("Reinitializing system...")
         
-        # Clear existing services
         global document_service, rag_service, system_ready, initialization_error
         
-        if document_service:
-            document_service.clear()
-        
-        if rag_service:
-            rag_service.clear()
-        
-        system_ready = False
-        initialization_error = None
-        
-        # Reinitialize
-        success = initialize_system()
+        # Wait for any initialization in progress, then hold off new ones
+        with _init_lock:
+            # Clear existing services
+            if document_service:
+                document_service.clear()
+            
+            if rag_service:
+                rag_service.clear()
+            
+            clear_caches()
+            
+            system_ready = False
+            initialization_error = None
+            
+            # Reinitialize
+            success = initialize_system()
         
         if success:
             logger.info("Reinitialization completed successfully")
@@ -256,17 +445,21 @@ def internal_error(error):
     logger.error(f"Internal server error: {error}")
     return jsonify({"error": "Internal server error"}), 500
 
+def create_app() -> Flask:
+    """Initialize the system and return the app for a WSGI server"""
+    if not initialize_system():
+        raise RuntimeError(f"Failed to initialize system: {initialization_error}")
+    return app
+
 if __name__ == '__main__':
     logger.info("Starting Chatbot Application")
     
-    # Initialize system
-    if initialize_system():
-        logger.info(f"Starting Flask server on {Config.HOST}:{Config.PORT}")
-        app.run(
-            debug=Config.DEBUG,
-            host=Config.HOST,
-            port=Config.PORT
-        )
-    else:
-        logger.error("Failed to initialize system. Exiting.")
-        sys.exit(1) 
\ No newline at end of file
+    # Initialize in the background; /api/status reports progress meanwhile
+    threading.Thread(target=initialize_system, name="system-init", daemon=True).start()
+    
+    logger.info(f"Starting Flask server on {CONFIG.HOST}:{CONFIG.PORT}")
+    app.run(
+        debug=CONFIG.DEBUG,
+        host=CONFIG.HOST,
+        port=CONFIG.PORT
+    ) 
\ No newline at end of file
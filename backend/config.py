@@ -1,47 +1,96 @@
 import os
+from dataclasses import dataclass, field
 from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv(override=True)
 
-class Config:
-    """Application configuration"""
+@dataclass(frozen=True, slots=True)
+class _Config:
+    """Application configuration, read from the environment once at import"""
     
     # Flask settings
-    SECRET_KEY = os.urandom(24)
-    DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
-    HOST = os.getenv('FLASK_HOST', '0.0.0.0')
-    PORT = int(os.getenv('FLASK_PORT', '5001'))
+    SECRET_KEY: bytes = field(default_factory=lambda: os.urandom(24))
+    DEBUG: bool = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
+    HOST: str = os.getenv('FLASK_HOST', '0.0.0.0')
+    PORT: int = int(os.getenv('FLASK_PORT', '5001'))
     
     # API Keys
-    GROQ_API_KEY = os.getenv('GROQ_API_KEY')
+    GROQ_API_KEY: Optional[str] = os.getenv('GROQ_API_KEY')
     
     # RAG Configuration
-    PDF_FOLDER = os.getenv('PDF_FOLDER', 'content/')
-    CHROMA_PERSIST_DIR = os.getenv('CHROMA_PERSIST_DIR', 'dbVector')
-    HF_EMBEDDING_MODEL_NAME = os.getenv('HF_EMBEDDING_MODEL', 'sentence-transformers/paraphrase-multilingual-mpnet-base-v2')
-    GROQ_MODEL_NAME = os.getenv('GROQ_MODEL', 'llama3-8b-8192')
+    PDF_FOLDER: str = os.getenv('PDF_FOLDER', 'content/')
+    CHROMA_PERSIST_DIR: str = os.getenv('CHROMA_PERSIST_DIR', 'dbVector')
+    HF_EMBEDDING_MODEL_NAME: str = os.getenv('HF_EMBEDDING_MODEL', 'sentence-transformers/paraphrase-multilingual-mpnet-base-v2')
+    GROQ_MODEL_NAME: str = os.getenv('GROQ_MODEL', 'llama3-8b-8192')
+    GROQ_MAX_CONNECTIONS: int = int(os.getenv('GROQ_MAX_CONNECTIONS', '32'))
+    GROQ_MAX_RETRIES: int = int(os.getenv('GROQ_MAX_RETRIES', '2'))
+    HF_CACHE_DIR: str = os.getenv('HF_CACHE_DIR', 'hfModels')
+    # 'auto', 'cuda', 'mps' or 'cpu'; always 'cpu' under gunicorn (see PRELOAD_BEFORE_FORK)
+    EMBEDDING_DEVICE: str = os.getenv('EMBEDDING_DEVICE', 'auto').lower()
+    
+    # ONNX Runtime embeddings (ONNX export of HF_EMBEDDING_MODEL_NAME)
+    USE_ONNX_EMBEDDINGS: bool = os.getenv('USE_ONNX_EMBEDDINGS', 'False').lower() == 'true'
+    ONNX_CACHE_DIR: str = os.getenv('ONNX_CACHE_DIR', 'onnxModels')
+    ONNX_PRECISION: str = os.getenv('ONNX_PRECISION', 'int8').lower()  # 'int8', 'fp32' or 'fp16' (OpenVINO)
+    ONNX_PROVIDER: str = os.getenv('ONNX_PROVIDER', 'CPUExecutionProvider')
+    
+    # Vector store settings ('faiss' or 'chroma')
+    VECTOR_BACKEND: str = os.getenv('VECTOR_BACKEND', 'faiss').lower()
+    ANN_INDEX_TYPE: str = os.getenv('ANN_INDEX_TYPE', 'auto').lower()  # 'auto', 'hnsw', 'ivf' or 'ivfpq'
+    ANN_IVF_THRESHOLD: int = int(os.getenv('ANN_IVF_THRESHOLD', '200000'))
+    ANN_TRAIN_SAMPLE_SIZE: int = int(os.getenv('ANN_TRAIN_SAMPLE_SIZE', '10000'))
+    ANN_MMAP: bool = os.getenv('ANN_MMAP', 'True').lower() == 'true'
+    # FAISS vector storage: 'none' (float32), 'fp16' or 'int8' scalar quantization
+    ANN_QUANTIZATION: str = os.getenv('ANN_QUANTIZATION', 'none').lower()
+    CHROMA_BATCH_SIZE: int = int(os.getenv('CHROMA_BATCH_SIZE', '128'))
+    HNSW_M: int = int(os.getenv('HNSW_M', '32'))
+    HNSW_EF_CONSTRUCTION: int = int(os.getenv('HNSW_EF_CONSTRUCTION', '40'))
+    HNSW_EF_SEARCH: int = int(os.getenv('HNSW_EF_SEARCH', '16'))
     
     # Processing settings
-    DEFAULT_K_RETRIEVAL = int(os.getenv('DEFAULT_K_RETRIEVAL', '5'))
-    CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', '1000'))
-    CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', '200'))
+    DEFAULT_K_RETRIEVAL: int = int(os.getenv('DEFAULT_K_RETRIEVAL', '5'))
+    # Chunk sizes are in tokens of TOKENIZER_ENCODING (~4 characters per token)
+    TOKENIZER_ENCODING: str = os.getenv('TOKENIZER_ENCODING', 'cl100k_base')
+    TIKTOKEN_CACHE_DIR: str = os.getenv('TIKTOKEN_CACHE_DIR', 'tiktokenCache')
+    CHUNK_SIZE_TOKENS: int = int(os.getenv('CHUNK_SIZE_TOKENS', '250'))
+    CHUNK_OVERLAP_TOKENS: int = int(os.getenv('CHUNK_OVERLAP_TOKENS', '50'))
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+    EMBEDDING_CACHE_PATH: str = os.getenv('EMBEDDING_CACHE_PATH', 'embeddingCache.sqlite3')
+    # Retrieved context: most query-relevant sentences kept per chunk (0 keeps whole
+    # chunks), and the total token budget of the context sent to the LLM
+    CONTEXT_SENTENCES_PER_DOC: int = int(os.getenv('CONTEXT_SENTENCES_PER_DOC', '3'))
+    CONTEXT_MAX_TOKENS: int = int(os.getenv('CONTEXT_MAX_TOKENS', '4000'))
     
     # Performance settings
-    MAX_REBUILD_ATTEMPTS = 3
-    RETRY_DELAY = 0.5
+    SEARCH_WORKERS: int = int(os.getenv('SEARCH_WORKERS', '4'))
+    QUERY_CACHE_SIZE: int = int(os.getenv('QUERY_CACHE_SIZE', '2000'))
+    QUERY_CACHE_TTL: int = int(os.getenv('QUERY_CACHE_TTL', '600'))  # Seconds
+    RESPONSE_CACHE_SIZE: int = int(os.getenv('RESPONSE_CACHE_SIZE', '2048'))
+    INIT_RETRY_AFTER: int = int(os.getenv('INIT_RETRY_AFTER', '10'))  # Seconds, sent while initializing
+    MAX_REBUILD_ATTEMPTS: int = 3
+    RETRY_DELAY: float = 0.5
+    # Set by gunicorn.conf.py: initialization runs in the master, which then forks
+    # the workers. Thread pools (OpenMP, ONNX Runtime) and CUDA contexts created
+    # before the fork hang or fail in the children, so the master stays on one CPU thread
+    PRELOAD_BEFORE_FORK: bool = os.getenv('PRELOAD_BEFORE_FORK', 'False').lower() == 'true'
     
-    @classmethod
-    def validate(cls) -> Optional[str]:
+    def validate(self) -> Optional[str]:
         """Validate critical configuration values"""
-        if not cls.GROQ_API_KEY:
+        if not self.GROQ_API_KEY:
             return "GROQ_API_KEY environment variable is required"
         
-        if not os.path.exists(cls.PDF_FOLDER):
+        if not os.path.exists(self.PDF_FOLDER):
             try:
-                os.makedirs(cls.PDF_FOLDER, exist_ok=True)
+                os.makedirs(self.PDF_FOLDER, exist_ok=True)
             except Exception as e:
                 return f"Cannot create PDF folder: {e}"
         
-        return None 
\ No newline at end of file
+        return None
+
+CONFIG = _Config()
+
+# tiktoken downloads its BPE files on first use; keep them next to the app (like
+# the HF models) instead of a temp dir, so restarts and offline hosts reuse them
+os.environ['TIKTOKEN_CACHE_DIR'] = CONFIG.TIKTOKEN_CACHE_DIR
\ No newline at end of file
@@ -0,0 +1,48 @@
+import os
+import sys
+import multiprocessing
+
+# The master initializes everything and then forks; keep it free of thread pools
+# that would not survive the fork (read by config, so set before importing it)
+os.environ['PRELOAD_BEFORE_FORK'] = 'true'
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+from config import CONFIG
+
+bind = f"{CONFIG.HOST}:{CONFIG.PORT}"
+
+# Threaded workers: the Groq call releases the GIL while waiting on the network.
+# Each worker runs embedding and FAISS math on its own share of the cores, so a
+# few workers with several threads beat the usual 2 * cores + 1
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+worker_class = "gthread"
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = 120
+keepalive = 5
+
+# Load documents, models and the vector store once in the master, then fork
+preload_app = True
+
+def post_fork(server, worker):
+    """Reset per-process state that does not survive fork"""
+    import app
+    
+    # The log queue listener thread is not copied into the child; the master
+    # keeps the rotating log file, workers log to stdout only
+    app.log_listener = app.setup_logging(log_file=False)
+    
+    # Per-process state: /api/reinitialize would reload only this worker and
+    # rewrite the vector store under the others
+    app.reinitialize_enabled = False
+    
+    # Split the cores between workers instead of each using all of them; the
+    # master never started a thread pool, so each worker can create its own
+    cpu_threads = max(1, multiprocessing.cpu_count() // server.cfg.workers)
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(cpu_threads)
+    if 'faiss' in sys.modules:
+        sys.modules['faiss'].omp_set_num_threads(cpu_threads)
+    
+    # Keep-alive sockets opened in the master must not be shared between workers
+    if app.rag_service:
+        app.rag_service.reset_connections()
\ No newline at end of file
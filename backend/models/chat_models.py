@@ -8,20 +8,20 @@ class ChatMode(Enum):
     LLM_ONLY = "LLM_ONLY" 
     UNAVAILABLE = "UNAVAILABLE"
 
-@dataclass
+@dataclass(slots=True)
 class ChatMessage:
     """Represents a chat message"""
     message: str
     timestamp: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class DocumentSource:
     """Represents a document source with metadata"""
     source_file: str
     page: str
     score: float
 
-@dataclass
+@dataclass(slots=True)
 class ChatRequest:
     """Chat API request model"""
     message: str
@@ -45,7 +45,7 @@ class ChatRequest:
         
         return cls(message=message, k_context=k_context)
 
-@dataclass
+@dataclass(slots=True)
 class ChatResponse:
     """Chat API response model"""
     question: str
@@ -73,7 +73,7 @@ class ChatResponse:
             'error': self.error
         }
 
-@dataclass
+@dataclass(slots=True)
 class SystemStatus:
     """System status model"""
     rag_pipeline_ready: bool
@@ -82,6 +82,10 @@ class SystemStatus:
     loaded_documents: List[str]
     initialization_error: Optional[str]
     message: str
+    initializing: bool = False
+    docs_loaded: bool = False
+    chunks_ready: bool = False
+    vector_store_ready: bool = False
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON response"""
@@ -91,5 +95,9 @@ class SystemStatus:
             'db_ready': self.db_ready,
             'loaded_pdfs': self.loaded_documents,  # Keep 'loaded_pdfs' for backward compatibility
             'initialization_error': self.initialization_error,
-            'message': self.message
+            'message': self.message,
+            'initializing': self.initializing,
+            'docs_loaded': self.docs_loaded,
+            'chunks_ready': self.chunks_ready,
+            'vector_store_ready': self.vector_store_ready
         } 
\ No newline at end of file
@@ -1,8 +1,14 @@
 # Services package
 from .document_service import DocumentService
 from .rag_service import RAGService
+from .faiss_store import FAISSVectorStore
+from .embedding_cache import EmbeddingCache
+from .query_cache import QueryCache
 
 __all__ = [
     'DocumentService',
-    'RAGService'
+    'RAGService',
+    'FAISSVectorStore',
+    'EmbeddingCache',
+    'QueryCache'
 ] 
\ No newline at end of file
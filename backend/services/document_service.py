@@ -1,36 +1,78 @@
 import os
 import logging
-from typing import List, Tuple, Optional
-from langchain_community.document_loaders import PyPDFLoader, CSVLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple, Optional, Dict, Any
+import fitz
+import pandas as pd
+from langchain_community.document_loaders import PyPDFLoader
 from langchain.schema import Document
 
-from config import Config
-from utils.text_processing import normalize_text, sanitize_filename
+from config import CONFIG
+from utils.text_processing import normalize_texts, sanitize_filename, chunk_text_by_tokens
 
 logger = logging.getLogger(__name__)
 
+def _extract_pdf_pages(file_path: str) -> Optional[List[Tuple[int, str]]]:
+    """
+    Extract normalized page texts from a PDF with PyMuPDF.
+    
+    Runs inside a worker process, so it must stay a module-level function.
+    
+    Args:
+        file_path: Path of the PDF file
+        
+    Returns:
+        List of (page_number, text) tuples, or None if extraction failed
+    """
+    try:
+        with fitz.open(file_path) as doc:
+            texts = [doc.load_page(i).get_text("text") for i in range(doc.page_count)]
+        return list(enumerate(normalize_texts(texts)))
+    except Exception:
+        return None
+
+def _prefetch_files(file_paths: List[str]):
+    """Ask the kernel to start reading files into the page cache ahead of parsing"""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    
+    for file_path in file_paths:
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.debug(f"Prefetch hint failed for {file_path}: {e}")
+
 class DocumentService:
     """Service for handling document operations"""
     
     def __init__(self):
-        self.loaded_documents: List[Document] = []
         self.chunks: List[Document] = []
-        self.loaded_filenames: List[str] = []
+        # Insertion-ordered set: O(1) membership, stable listing order
+        self.loaded_filenames: Dict[str, None] = {}
+        self.document_count = 0
         
     def load_documents(self) -> Tuple[bool, Optional[str]]:
         """
-        Load all documents from the configured folder.
+        Load all documents from the configured folder and split them into chunks.
+        
+        Each page is chunked as soon as it is loaded and then dropped, so pages
+        and chunks are never held in memory together.
         
         Returns:
             Tuple of (success, error_message)
         """
         try:
-            self.loaded_documents.clear()
-            self.loaded_filenames.clear()
+            self.chunks = []
+            self.loaded_filenames = {}
+            self.document_count = 0
             
             # Create folder if it doesn't exist
-            os.makedirs(Config.PDF_FOLDER, exist_ok=True)
+            os.makedirs(CONFIG.PDF_FOLDER, exist_ok=True)
             
             # Load PDFs
             pdf_success = self._load_pdf_files()
@@ -38,10 +80,14 @@ class DocumentService:
             # Load CSVs  
             csv_success = self._load_csv_files()
             
-            if not self.loaded_documents:
+            if not self.document_count:
                 return False, "No valid documents found to load"
             
-            logger.info(f"Successfully loaded {len(self.loaded_documents)} pages from {len(self.loaded_filenames)} files")
+            if not self.chunks:
+                return False, "No chunks created from documents"
+            
+            logger.info(f"Successfully loaded {self.document_count} pages from {len(self.loaded_filenames)} files "
+                        f"into {len(self.chunks)} chunks")
             return True, None
             
         except Exception as e:
@@ -51,7 +97,7 @@ class DocumentService:
     def _load_pdf_files(self) -> bool:
         """Load PDF files from the content folder"""
         try:
-            pdf_files = [f for f in os.listdir(Config.PDF_FOLDER) if f.lower().endswith('.pdf')]
+            pdf_files = [f for f in os.listdir(CONFIG.PDF_FOLDER) if f.lower().endswith('.pdf')]
             
             if not pdf_files:
                 logger.info("No PDF files found")
@@ -59,8 +105,27 @@ class DocumentService:
             
             logger.info(f"Found {len(pdf_files)} PDF files to process")
             
-            for pdf_file in pdf_files:
-                self._load_single_pdf(pdf_file)
+            pdf_paths = [os.path.join(CONFIG.PDF_FOLDER, f) for f in pdf_files]
+            
+            # Overlap disk reads with parsing of the first files
+            _prefetch_files(pdf_paths)
+            
+            # Text extraction is CPU-bound and independent per file
+            processed = 0
+            try:
+                with ProcessPoolExecutor(max_workers=min(len(pdf_paths), os.cpu_count() or 1)) as executor:
+                    results = executor.map(_extract_pdf_pages, pdf_paths, chunksize=4)
+                    
+                    for pdf_file, pages in zip(pdf_files, results):
+                        self._add_extracted_pdf(pdf_file, pages)
+                        processed += 1
+                        
+            except BrokenProcessPool as e:
+                # A malformed PDF can crash the native parser and take the pool down with it
+                remaining = pdf_files[processed:]
+                logger.warning(f"PDF worker process died ({e}), loading {len(remaining)} remaining files with PyPDFLoader")
+                for pdf_file in remaining:
+                    self._load_single_pdf(pdf_file)
                 
             return True
             
@@ -68,11 +133,60 @@ class DocumentService:
             logger.error(f"Error loading PDF files: {e}")
             return False
     
+    def _add_extracted_pdf(self, filename: str, pages: Optional[List[Tuple[int, str]]]) -> bool:
+        """Add one file's extracted pages, isolating failures to that file"""
+        if pages is None:
+            logger.warning(f"PyMuPDF failed on {filename}, falling back to PyPDFLoader")
+            return self._load_single_pdf(filename)
+        
+        chunk_count, document_count = len(self.chunks), self.document_count
+        try:
+            return self._add_pdf_pages(filename, pages)
+        except Exception as e:
+            # Drop the file's partial chunks so it is either fully loaded or absent
+            del self.chunks[chunk_count:]
+            self.document_count = document_count
+            logger.error(f"Error loading PDF {filename}: {e}")
+            return False
+    
+    def _add_pdf_pages(self, filename: str, pages: List[Tuple[int, str]]) -> bool:
+        """Wrap extracted page texts into documents"""
+        safe_filename = sanitize_filename(filename)
+        
+        valid_pages = 0
+        for page_num, text in pages:
+            if not text.strip():
+                continue
+            
+            self._add_page(text, {"source_file": safe_filename, "page": page_num})
+            valid_pages += 1
+        
+        if not valid_pages:
+            logger.warning(f"No valid content found in {filename}")
+            return False
+        
+        self.loaded_filenames[safe_filename] = None
+        logger.info(f"Loaded {valid_pages} valid pages from {filename}")
+        return True
+    
+    def _add_page(self, text: str, metadata: Dict[str, Any]):
+        """Split a single page into chunks; the page itself is not retained"""
+        self.chunks.extend(
+            Document(page_content=chunk, metadata={**metadata, "start_index": start_index})
+            for start_index, chunk in chunk_text_by_tokens(
+                text,
+                chunk_size=CONFIG.CHUNK_SIZE_TOKENS,
+                overlap=CONFIG.CHUNK_OVERLAP_TOKENS,
+                encoding_name=CONFIG.TOKENIZER_ENCODING
+            )
+        )
+        self.document_count += 1
+    
     def _load_single_pdf(self, filename: str) -> bool:
-        """Load a single PDF file"""
+        """Load a single PDF file with PyPDFLoader"""
         try:
             safe_filename = sanitize_filename(filename)
-            file_path = os.path.join(Config.PDF_FOLDER, filename)
+            file_path = os.path.join(CONFIG.PDF_FOLDER, filename)
             
             if not os.path.exists(file_path):
                 logger.warning(f"PDF file not found: {filename}")
@@ -87,21 +201,19 @@ class DocumentService:
                 logger.warning(f"No pages extracted from {filename}")
                 return False
             
-            valid_pages = []
-            for page in pages:
-                page.page_content = normalize_text(page.page_content)
-                
-                if not page.page_content.strip():
+            valid_pages = 0
+            texts = normalize_texts([page.page_content for page in pages])
+            for page, text in zip(pages, texts):
+                if not text.strip():
                     continue
                 
                 page.metadata["source_file"] = safe_filename
-                valid_pages.append(page)
+                self._add_page(text, page.metadata)
+                valid_pages += 1
             
             if valid_pages:
-                self.loaded_documents.extend(valid_pages)
-                if safe_filename not in self.loaded_filenames:
-                    self.loaded_filenames.append(safe_filename)
-                logger.info(f"Loaded {len(valid_pages)} valid pages from {filename}")
+                self.loaded_filenames[safe_filename] = None
+                logger.info(f"Loaded {valid_pages} valid pages from {filename}")
                 return True
             else:
                 logger.warning(f"No valid content found in {filename}")
@@ -114,7 +226,7 @@ class DocumentService:
     def _load_csv_files(self) -> bool:
         """Load CSV files from the content folder"""
         try:
-            csv_files = [f for f in os.listdir(Config.PDF_FOLDER) if f.lower().endswith('.csv')]
+            csv_files = [f for f in os.listdir(CONFIG.PDF_FOLDER) if f.lower().endswith('.csv')]
             
             if not csv_files:
                 logger.info("No CSV files found")
@@ -135,7 +247,7 @@ class DocumentService:
         """Load a single CSV file"""
         try:
             safe_filename = sanitize_filename(filename)
-            file_path = os.path.join(Config.PDF_FOLDER, filename)
+            file_path = os.path.join(CONFIG.PDF_FOLDER, filename)
             
             if not os.path.exists(file_path):
                 logger.warning(f"CSV file not found: {filename}")
@@ -143,73 +255,43 @@ class DocumentService:
             
             logger.info(f"Loading CSV: {filename}")
             
-            loader = CSVLoader(file_path=file_path)
-            csv_docs = loader.load()
+            # C parser with dtype=str keeps every cell's raw text like CSVLoader
+            # ("007" stays "007"); the Arrow engine infers types before converting
+            df = pd.read_csv(file_path, dtype=str, keep_default_na=False)
             
-            if not csv_docs:
+            if df.empty:
                 logger.warning(f"No content loaded from {filename}")
                 return False
             
-            for doc in csv_docs:
-                doc.metadata["source_file"] = safe_filename
+            # One "column: value" line per cell, the same layout CSVLoader produced
+            columns = [str(column).strip() for column in df.columns]
+            for row_num, values in enumerate(df.itertuples(index=False, name=None)):
+                row_text = "\n".join(f"{column}: {value.strip()}" for column, value in zip(columns, values))
+                self._add_page(row_text, {"source": file_path, "row": row_num, "source_file": safe_filename})
             
-            self.loaded_documents.extend(csv_docs)
-            if safe_filename not in self.loaded_filenames:
-                self.loaded_filenames.append(safe_filename)
+            self.loaded_filenames[safe_filename] = None
                 
-            logger.info(f"Loaded {len(csv_docs)} rows from {filename}")
+            logger.info(f"Loaded {len(df)} rows from {filename}")
             return True
             
         except Exception as e:
             logger.error(f"Error loading CSV {filename}: {e}")
             return False
     
-    def create_chunks(self) -> Tuple[bool, Optional[str]]:
-        """
-        Split loaded documents into chunks.
-        
-        Returns:
-            Tuple of (success, error_message)
-        """
-        try:
-            if not self.loaded_documents:
-                return False, "No documents loaded to chunk"
-            
-            logger.info(f"Creating chunks from {len(self.loaded_documents)} documents")
-            
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=Config.CHUNK_SIZE,
-                chunk_overlap=Config.CHUNK_OVERLAP,
-                length_function=len,
-                add_start_index=True
-            )
-            
-            self.chunks = text_splitter.split_documents(self.loaded_documents)
-            
-            if not self.chunks:
-                return False, "No chunks created from documents"
-            
-            logger.info(f"Created {len(self.chunks)} chunks")
-            return True, None
-            
-        except Exception as e:
-            logger.error(f"Error creating chunks: {e}")
-            return False, f"Chunk creation failed: {str(e)}"
-    
-    def get_documents(self) -> List[Document]:
-        """Get loaded documents"""
-        return self.loaded_documents.copy()
+    # get_chunks returns the service's own list without copying.
+    # Callers must treat it as read-only.
     
     def get_chunks(self) -> List[Document]:
-        """Get document chunks"""
-        return self.chunks.copy()
+        """Get document chunks (read-only)"""
+        return self.chunks
     
     def get_loaded_filenames(self) -> List[str]:
         """Get list of loaded filenames"""
-        return self.loaded_filenames.copy()
+        return list(self.loaded_filenames)
     
     def clear(self):
         """Clear all loaded data"""
-        self.loaded_documents.clear()
-        self.chunks.clear()
-        self.loaded_filenames.clear() 
\ No newline at end of file
+        # Rebind instead of clearing in place so lists handed out stay intact
+        self.chunks = []
+        self.loaded_filenames = {}
+        self.document_count = 0 
\ No newline at end of file
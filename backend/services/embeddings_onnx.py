@@ -0,0 +1,120 @@
+import os
+import logging
+from typing import List
+
+import numpy as np
+import onnxruntime as ort
+from langchain_core.embeddings import Embeddings
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
+
+from utils.text_processing import sanitize_filename
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+
+PRECISIONS = ("int8", "fp32", "fp16")
+
+class ONNXEmbeddings(Embeddings):
+    """
+    Sentence embeddings served by ONNX Runtime.
+
+    Precision "int8" runs a dynamically quantized export on the CPU provider;
+    "fp32" runs the plain export; "fp16" runs the plain export with FP16
+    inference on the OpenVINO provider (onnxruntime-openvino).
+    """
+
+    def __init__(self, model_name: str, cache_dir: str, batch_size: int = 32, max_length: int = 128,
+                 precision: str = "int8", provider: str = "CPUExecutionProvider",
+                 intra_op_threads: int = 0):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unsupported ONNX precision: {precision}")
+
+        self.model_dir = os.path.join(cache_dir, sanitize_filename(model_name))
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+        if not os.path.exists(os.path.join(self.model_dir, MODEL_FILE)):
+            self._export_model(model_name)
+
+        model_file = MODEL_FILE
+        if precision == "int8":
+            model_file = QUANTIZED_MODEL_FILE
+            if not os.path.exists(os.path.join(self.model_dir, model_file)):
+                self._quantize_model()
+
+        if precision == "fp16":
+            provider = "OpenVINOExecutionProvider"
+            providers = [(provider, {"precision": "FP16"})]
+        else:
+            providers = [provider]
+
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # 0 lets ONNX Runtime size its own thread pool
+        session_options.intra_op_num_threads = intra_op_threads
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        self.session = ort.InferenceSession(
+            os.path.join(self.model_dir, model_file),
+            sess_options=session_options,
+            providers=providers
+        )
+        self.input_names = [node.name for node in self.session.get_inputs()]
+
+        logger.info(f"ONNX embeddings ready: {model_file} on {provider} ({precision})")
+
+    def _export_model(self, model_name: str):
+        """Export the model to ONNX (one-time, cached on disk)"""
+        logger.info(f"Exporting {model_name} to ONNX in {self.model_dir}")
+
+        os.makedirs(self.model_dir, exist_ok=True)
+
+        model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+        model.save_pretrained(self.model_dir)
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(self.model_dir)
+
+    def _quantize_model(self):
+        """Quantize the exported model to INT8 (one-time, cached on disk)"""
+        logger.info(f"Quantizing ONNX model in {self.model_dir}")
+
+        quantizer = ORTQuantizer.from_pretrained(self.model_dir, file_name=MODEL_FILE)
+        quantization_config = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=self.model_dir, quantization_config=quantization_config)
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed one batch: forward pass, mean pooling and L2 normalization"""
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names if name in encoded}
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        mask = encoded["attention_mask"][..., np.newaxis].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents"""
+        if not texts:
+            return []
+
+        batches = [
+            self._embed_batch(texts[i:i + self.batch_size])
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        return np.vstack(batches).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query"""
+        return self._embed_batch([text])[0].tolist()
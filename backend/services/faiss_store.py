@@ -0,0 +1,206 @@
+import os
+import json
+import math
+import logging
+from typing import List, Tuple, Dict, Any
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.faiss"
+DOCUMENTS_FILE = "documents.json"
+
+# Use every core for index training, adds and searches. A master that forks
+# workers stays single-threaded: libgomp's pool does not survive fork, and a child
+# entering a multi-threaded region afterwards blocks forever
+faiss.omp_set_num_threads(1 if CONFIG.PRELOAD_BEFORE_FORK else os.cpu_count() or 1)
+
+# Vectors added per call, bounding the temporary memory of encoding
+_ADD_BATCH_SIZE = 65536
+
+# Bits per product-quantizer code; training needs at least 2**bits vectors
+_PQ_NBITS = 8
+
+# Scalar quantizers per ANN_QUANTIZATION; None stores full float32 vectors
+_SCALAR_QUANTIZERS = {
+    'none': None,
+    'fp16': faiss.ScalarQuantizer.QT_fp16,
+    'int8': faiss.ScalarQuantizer.QT_8bit,
+}
+
+def _resolve_index_type(n: int) -> str:
+    """Pick the ANN index type for a corpus of n vectors"""
+    if CONFIG.ANN_INDEX_TYPE != 'auto':
+        return CONFIG.ANN_INDEX_TYPE
+    return 'ivf' if n > CONFIG.ANN_IVF_THRESHOLD else 'hnsw'
+
+def _pq_subquantizers(d: int) -> int:
+    """Number of PQ sub-vectors: the largest divisor of d leaving at least 4 dimensions each"""
+    return max(m for m in range(1, max(d // 4, 1) + 1) if d % m == 0)
+
+def _training_sample(vectors: np.ndarray, nlist: int) -> np.ndarray:
+    """Random subset of vectors for training; IVF wants about 39 points per centroid"""
+    n = vectors.shape[0]
+    size = max(CONFIG.ANN_TRAIN_SAMPLE_SIZE, 39 * nlist)
+    if n <= size:
+        return vectors
+    rows = np.random.default_rng(0).choice(n, size=size, replace=False)
+    return vectors[np.sort(rows)]
+
+def _build_index(vectors: np.ndarray) -> faiss.Index:
+    """
+    Build and fill an ANN index for the given vectors.
+
+    HNSW is used for small and medium corpora; IVF builds much faster and
+    uses less memory once the corpus grows past ANN_IVF_THRESHOLD. With
+    ANN_QUANTIZATION set, vectors are stored as fp16 or int8 codes (2x or 4x
+    smaller) while queries stay float32. IVFPQ (ANN_INDEX_TYPE 'ivfpq')
+    compresses each vector to a few bytes of product-quantizer codes for
+    corpora too large to keep in memory as floats.
+
+    Args:
+        vectors: L2-normalized float32 matrix of shape (n, d)
+
+    Returns:
+        Populated FAISS index
+    """
+    n, d = vectors.shape
+    index_type = _resolve_index_type(n)
+
+    if CONFIG.ANN_QUANTIZATION not in _SCALAR_QUANTIZERS:
+        raise ValueError(f"Unsupported ANN quantization: {CONFIG.ANN_QUANTIZATION}")
+    scalar_quantizer = _SCALAR_QUANTIZERS[CONFIG.ANN_QUANTIZATION]
+
+    if index_type == 'ivfpq' and n < 2 ** _PQ_NBITS:
+        logger.warning(f"Too few vectors ({n}) to train product quantization, using IVF")
+        index_type = 'ivf'
+
+    nlist = min(max(int(2 * math.sqrt(n)), 20), n)
+
+    if index_type == 'ivfpq':
+        m = _pq_subquantizers(d)
+        quantizer = faiss.IndexFlatIP(d)
+        index = faiss.IndexIVFPQ(quantizer, d, nlist, m, _PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+        index.nprobe = max(min(nlist // 4, 10), 1)
+        logger.info(f"Building IVFPQ index: nlist={nlist}, nprobe={index.nprobe}, m={m}")
+    elif index_type == 'ivf':
+        quantizer = faiss.IndexFlatIP(d)
+        if scalar_quantizer is None:
+            index = faiss.IndexIVFFlat(quantizer, d, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, d, nlist, scalar_quantizer, faiss.METRIC_INNER_PRODUCT)
+        index.nprobe = max(min(nlist // 4, 10), 1)
+        logger.info(f"Building IVF index: nlist={nlist}, nprobe={index.nprobe}, quantization={CONFIG.ANN_QUANTIZATION}")
+    else:
+        if scalar_quantizer is None:
+            index = faiss.IndexHNSWFlat(d, CONFIG.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexHNSWSQ(d, scalar_quantizer, CONFIG.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = CONFIG.HNSW_EF_CONSTRUCTION
+        logger.info(f"Building HNSW index: M={CONFIG.HNSW_M}, quantization={CONFIG.ANN_QUANTIZATION}")
+
+    # IVF centroids and quantizer codebooks are learned once, from a sample
+    if not index.is_trained:
+        index.train(_training_sample(vectors, nlist))
+
+    for start in range(0, n, _ADD_BATCH_SIZE):
+        index.add(vectors[start:start + _ADD_BATCH_SIZE])
+    return index
+
+class FAISSVectorStore:
+    """FAISS vector store with a parallel document list for row id lookup"""
+
+    def __init__(self, index: faiss.Index, documents: List[Document],
+                 embedding_function: Embeddings, persist_directory: str):
+        self.index = index
+        self.documents = documents
+        self.embedding_function = embedding_function
+        self.persist_directory = persist_directory
+
+    @classmethod
+    def from_embeddings(cls, texts: List[str], embeddings: List[List[float]],
+                        metadatas: List[Dict[str, Any]], embedding_function: Embeddings,
+                        persist_directory: str) -> 'FAISSVectorStore':
+        """Build an ANN index from precomputed embeddings and persist it"""
+        # Inner product on unit vectors is cosine similarity
+        vectors = np.ascontiguousarray(embeddings, dtype='float32')
+        faiss.normalize_L2(vectors)
+        index = _build_index(vectors)
+
+        documents = [
+            Document(page_content=text, metadata=metadata)
+            for text, metadata in zip(texts, metadatas)
+        ]
+
+        store = cls(index, documents, embedding_function, persist_directory)
+        store.save()
+        return store
+
+    @classmethod
+    def load(cls, embedding_function: Embeddings, persist_directory: str) -> 'FAISSVectorStore':
+        """Load a persisted index and its documents"""
+        # Memory-mapped IVF lists load instantly and are paged in on demand
+        io_flags = faiss.IO_FLAG_MMAP if CONFIG.ANN_MMAP else 0
+        index = faiss.read_index(os.path.join(persist_directory, INDEX_FILE), io_flags)
+
+        with open(os.path.join(persist_directory, DOCUMENTS_FILE), 'r', encoding='utf-8') as f:
+            documents = [Document(**doc) for doc in json.load(f)]
+
+        if index.metric_type != faiss.METRIC_INNER_PRODUCT:
+            raise ValueError("Index was not built with the inner product metric")
+
+        if index.ntotal != len(documents):
+            raise ValueError(f"Index has {index.ntotal} vectors but {len(documents)} documents")
+
+        return cls(index, documents, embedding_function, persist_directory)
+
+    def save(self):
+        """Persist the index and documents to the persist directory"""
+        os.makedirs(self.persist_directory, exist_ok=True)
+
+        faiss.write_index(self.index, os.path.join(self.persist_directory, INDEX_FILE))
+
+        with open(os.path.join(self.persist_directory, DOCUMENTS_FILE), 'w', encoding='utf-8') as f:
+            json.dump(
+                [{'page_content': doc.page_content, 'metadata': doc.metadata} for doc in self.documents],
+                f,
+                ensure_ascii=False
+            )
+
+    def count(self) -> int:
+        """Number of indexed vectors"""
+        return self.index.ntotal
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: List[float],
+                                                          k: int = 4) -> List[Tuple[Document, float]]:
+        """Return the k nearest documents with their cosine distance"""
+        # k comes from clients; never ask for more neighbours than there are vectors
+        k = min(k, self.index.ntotal)
+        if k <= 0:
+            return []
+
+        # Per-call parameters, so concurrent searches never share a mutated efSearch
+        params = None
+        if isinstance(self.index, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW(efSearch=max(CONFIG.HNSW_EF_SEARCH, k))
+
+        query = np.array([embedding], dtype='float32')
+        faiss.normalize_L2(query)
+        similarities, ids = self.index.search(query, k, params=params)
+
+        return [
+            (self.documents[i], 1.0 - float(similarity))
+            for similarity, i in zip(similarities[0], ids[0])
+            if i != -1
+        ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """Embed the query and return the k nearest documents with their cosine distance"""
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_relevance_scores(embedding, k)
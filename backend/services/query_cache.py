@@ -0,0 +1,51 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from utils.text_processing import normalize_text
+
+class QueryCache:
+    """Thread-safe LRU cache with per-entry expiry for retrieval results"""
+    
+    def __init__(self, max_size: int = 2000, ttl_seconds: float = 600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.RLock()
+    
+    @staticmethod
+    def make_key(query: str, k: int) -> str:
+        """Cache key for a query and result count"""
+        digest = hashlib.blake2b(normalize_text(query).encode('utf-8'), digest_size=16).hexdigest()
+        return f"{digest}:{k}"
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            
+            self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key: str, value: Any):
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
\ No newline at end of file
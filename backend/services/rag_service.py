@@ -1,42 +1,173 @@
 import os
 import gc
+import json
+import stat
 import time
+import hashlib
 import shutil
 import logging
-from typing import List, Tuple, Optional
+from uuid import uuid4
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Optional, Union, Dict, Iterator
 
+import httpx
+import numpy as np
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 from langchain_groq import ChatGroq
 from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
 
-from config import Config
+from config import CONFIG
 from models.chat_models import DocumentSource, ChatMode
-from utils.text_processing import validate_input
+from services.faiss_store import FAISSVectorStore
+from services.embedding_cache import EmbeddingCache
+from services.query_cache import QueryCache
+from utils.text_processing import validate_input, sanitize_filename, split_sentences, truncate_by_tokens
 
 logger = logging.getLogger(__name__)
 
+MANIFEST_FILE = "manifest.json"
+
+# Instructions wrapped around retrieved context; filled in by _create_rag_prompt
+_RAG_TEMPLATE = """You are a helpful assistant with access to specific document context. Follow these guidelines:
+
+1. **PRIMARY PRIORITY**: Use the information from the provided CONTEXT below to answer the question.
+2. **SECONDARY PRIORITY**: If the context doesn't contain sufficient information, you may supplement with your general knowledge, but clearly indicate when you're doing so.
+3. **TRANSPARENCY**: Always specify your sources:
+   - For context-based info: "According to the provided documents..." or "Based on the context..."
+   - For general knowledge: "Based on general knowledge..." or "Generally speaking..."
+4. **ACCURACY**: Be factual and helpful. Don't make up specific details not found in either source.
+5. **COMPLETENESS**: Provide comprehensive answers when possible.
+
+CONTEXT FROM DOCUMENTS:
+--- start of context ---
+{context}
+--- end of context ---
+
+QUESTION:
+{query}
+
+HELPFUL RESPONSE (prioritizing context, supplementing with general knowledge when needed):"""
+
+def _create_groq_http_client() -> httpx.Client:
+    """Create a keep-alive connection pool for Groq API calls"""
+    limits = httpx.Limits(
+        max_connections=CONFIG.GROQ_MAX_CONNECTIONS,
+        max_keepalive_connections=CONFIG.GROQ_MAX_CONNECTIONS
+    )
+    # Transport retries cover connection failures; the Groq SDK retries 429/5xx
+    return httpx.Client(transport=httpx.HTTPTransport(limits=limits, retries=CONFIG.GROQ_MAX_RETRIES))
+
+def _resolve_embedding_device() -> str:
+    """Pick the torch device for HF embeddings: CUDA (or ROCm), then Apple MPS, then CPU"""
+    if CONFIG.PRELOAD_BEFORE_FORK:
+        # A CUDA or MPS context set up in the gunicorn master cannot be used by forked workers
+        if CONFIG.EMBEDDING_DEVICE not in ('auto', 'cpu'):
+            logger.warning(f"EMBEDDING_DEVICE={CONFIG.EMBEDDING_DEVICE} is not fork-safe, using cpu under gunicorn")
+        return 'cpu'
+    
+    if CONFIG.EMBEDDING_DEVICE != 'auto':
+        return CONFIG.EMBEDDING_DEVICE
+    
+    import torch
+    
+    if torch.cuda.is_available():
+        return 'cuda'
+    
+    mps = getattr(torch.backends, 'mps', None)
+    if mps is not None and mps.is_available():
+        return 'mps'
+    
+    return 'cpu'
+
+def _retry_writable(func, path, exc_info):
+    """rmtree error handler: add the write bit to read-only entries (set on Windows) and retry once"""
+    error = exc_info[1]
+    if not isinstance(error, PermissionError) or os.path.islink(path):
+        raise error
+    
+    os.chmod(path, os.lstat(path).st_mode | stat.S_IWRITE)
+    func(path)
+
 class RAGService:
     """Service for RAG operations"""
     
     def __init__(self):
-        self.embedding_model: Optional[HuggingFaceEmbeddings] = None
-        self.vector_db: Optional[Chroma] = None
+        self.embedding_model: Optional[Embeddings] = None
+        self.vector_db: Optional[Union[FAISSVectorStore, Chroma]] = None
         self.llm: Optional[ChatGroq] = None
+        self.http_client: Optional[httpx.Client] = None
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        self.query_cache = QueryCache(
+            max_size=CONFIG.QUERY_CACHE_SIZE,
+            ttl_seconds=CONFIG.QUERY_CACHE_TTL
+        )
+        self._search_pool = ThreadPoolExecutor(
+            max_workers=CONFIG.SEARCH_WORKERS,
+            thread_name_prefix="vector-search"
+        )
         self.is_ready = False
         
+    def initialize_all(self) -> Tuple[Tuple[bool, Optional[str]], Tuple[bool, Optional[str]]]:
+        """
+        Initialize the LLM and the embedding model concurrently.
+        
+        Neither depends on the other, and both mostly wait on network or disk,
+        so startup takes as long as the slower of the two.
+        
+        Returns:
+            ((llm_success, llm_error), (embed_success, embed_error))
+        """
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-init") as executor:
+            llm_future = executor.submit(self.initialize_llm)
+            embedding_future = executor.submit(self.initialize_embedding_model)
+            return llm_future.result(), embedding_future.result()
+    
     def initialize_embedding_model(self) -> Tuple[bool, Optional[str]]:
         """Initialize the embedding model"""
         try:
-            logger.info(f"Initializing embedding model: {Config.HF_EMBEDDING_MODEL_NAME}")
-            
-            self.embedding_model = HuggingFaceEmbeddings(
-                model_name=Config.HF_EMBEDDING_MODEL_NAME,
-                model_kwargs={'device': 'cpu'}
-            )
+            logger.info(f"Initializing embedding model: {CONFIG.HF_EMBEDDING_MODEL_NAME}")
             
-            # Test the model
-            _ = self.embedding_model.embed_query("Test embedding")
+            if CONFIG.USE_ONNX_EMBEDDINGS:
+                # Optional dependency, only needed for the ONNX backend
+                from services.embeddings_onnx import ONNXEmbeddings
+                
+                self.embedding_model = ONNXEmbeddings(
+                    model_name=CONFIG.HF_EMBEDDING_MODEL_NAME,
+                    cache_dir=CONFIG.ONNX_CACHE_DIR,
+                    precision=CONFIG.ONNX_PRECISION,
+                    provider=CONFIG.ONNX_PROVIDER,
+                    # Session thread pools are not fork-safe; run inline on the caller
+                    intra_op_threads=1 if CONFIG.PRELOAD_BEFORE_FORK else 0
+                )
+            else:
+                if CONFIG.PRELOAD_BEFORE_FORK:
+                    # No OpenMP pool in the master; workers size their own after fork
+                    import torch
+                    torch.set_num_threads(1)
+                
+                device = _resolve_embedding_device()
+                logger.info(f"Embedding device: {device}")
+                
+                # Accelerators take whole batches; small CPU batches keep padding and memory down
+                encode_batch_size = CONFIG.EMBEDDING_BATCH_SIZE if device != 'cpu' else min(16, CONFIG.EMBEDDING_BATCH_SIZE)
+                
+                self.embedding_model = HuggingFaceEmbeddings(
+                    model_name=CONFIG.HF_EMBEDDING_MODEL_NAME,
+                    cache_folder=CONFIG.HF_CACHE_DIR,
+                    model_kwargs={'device': device},
+                    encode_kwargs={'batch_size': encode_batch_size, 'normalize_embeddings': True}
+                )
+            
+            # Test the model once per cached model; warm restarts skip the forward pass
+            marker_path = self._warm_marker_path()
+            if not os.path.exists(marker_path):
+                _ = self.embedding_model.embed_query("Test embedding")
+                os.makedirs(os.path.dirname(marker_path), exist_ok=True)
+                open(marker_path, 'w').close()
+            
+            self._open_embedding_cache()
             
             logger.info("Embedding model initialized successfully")
             return True, None
@@ -46,21 +177,35 @@ class RAGService:
             self.embedding_model = None
             return False, f"Embedding model initialization failed: {str(e)}"
     
+    def _embedding_signature(self) -> str:
+        """Identify the model producing embeddings, so cached vectors never mix"""
+        backend = f"onnx-{CONFIG.ONNX_PRECISION}" if CONFIG.USE_ONNX_EMBEDDINGS else 'hf-normalized'
+        return f"{backend}:{CONFIG.HF_EMBEDDING_MODEL_NAME}"
+    
+    def _warm_marker_path(self) -> str:
+        """Marker file recording that the cached embedding model passed its test embed"""
+        cache_dir = CONFIG.ONNX_CACHE_DIR if CONFIG.USE_ONNX_EMBEDDINGS else CONFIG.HF_CACHE_DIR
+        return os.path.join(cache_dir, f".warmed-{sanitize_filename(self._embedding_signature())}")
+    
+    def _open_embedding_cache(self):
+        """Open the on-disk embedding cache; retrieval works without it"""
+        try:
+            self.embedding_cache = EmbeddingCache(CONFIG.EMBEDDING_CACHE_PATH, self._embedding_signature())
+        except Exception as e:
+            logger.warning(f"Embedding cache unavailable: {e}")
+            self.embedding_cache = None
+    
     def initialize_llm(self) -> Tuple[bool, Optional[str]]:
         """Initialize the LLM"""
         try:
-            if not Config.GROQ_API_KEY:
+            if not CONFIG.GROQ_API_KEY:
                 return False, "GROQ_API_KEY not configured"
             
-            logger.info(f"Initializing LLM: {Config.GROQ_MODEL_NAME}")
+            logger.info(f"Initializing LLM: {CONFIG.GROQ_MODEL_NAME}")
             
-            self.llm = ChatGroq(
-                model_name=Config.GROQ_MODEL_NAME,
-                api_key=Config.GROQ_API_KEY,
-                temperature=0.1
-            )
+            self.llm = self._create_llm()
             
-            # Test the LLM
+            # Test the LLM (also opens the pooled connection)
             _ = self.llm.invoke("Hello")
             
             logger.info("LLM initialized successfully")
@@ -71,6 +216,28 @@ class RAGService:
             self.llm = None
             return False, f"LLM initialization failed: {str(e)}"
     
+    def _create_llm(self) -> ChatGroq:
+        """Create the Groq chat model on a fresh reusable connection pool"""
+        if self.http_client:
+            self.http_client.close()
+        
+        self.http_client = _create_groq_http_client()
+        
+        return ChatGroq(
+            model_name=CONFIG.GROQ_MODEL_NAME,
+            api_key=CONFIG.GROQ_API_KEY,
+            temperature=0.1,
+            max_retries=CONFIG.GROQ_MAX_RETRIES,
+            http_client=self.http_client
+        )
+    
+    def reset_connections(self):
+        """Give this process its own Groq connections (call in a forked worker)"""
+        if self.llm:
+            # Drop the inherited pool without closing sockets the parent still owns
+            self.http_client = None
+            self.llm = self._create_llm()
+    
     def initialize_vector_store(self, chunks: List[Document]) -> Tuple[bool, Optional[str]]:
         """Initialize or load the vector store"""
         try:
@@ -83,7 +250,7 @@ class RAGService:
             logger.info("Initializing vector store")
             
             # Create persist directory
-            os.makedirs(Config.CHROMA_PERSIST_DIR, exist_ok=True)
+            os.makedirs(CONFIG.CHROMA_PERSIST_DIR, exist_ok=True)
             
             # Check if we need to rebuild
             needs_rebuild = self._check_vector_store_rebuild(chunks)
@@ -106,53 +273,101 @@ class RAGService:
     def _check_vector_store_rebuild(self, chunks: List[Document]) -> bool:
         """Check if vector store needs to be rebuilt"""
         try:
-            if not os.path.exists(Config.CHROMA_PERSIST_DIR):
-                return True
-            
-            if not any(os.scandir(Config.CHROMA_PERSIST_DIR)):
-                return True
-            
-            # Try to load existing store
-            temp_db = Chroma(
-                persist_directory=Config.CHROMA_PERSIST_DIR,
-                embedding_function=self.embedding_model
-            )
+            # A missing manifest also covers a missing or empty directory
+            with open(os.path.join(CONFIG.CHROMA_PERSIST_DIR, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
             
-            existing_count = temp_db._collection.count()
             current_count = len(chunks)
             
-            if existing_count != current_count:
-                logger.info(f"Vector store count mismatch: {existing_count} vs {current_count}")
+            if manifest.get('count') != current_count:
+                logger.info(f"Vector store count mismatch: {manifest.get('count')} vs {current_count}")
                 return True
             
+            if manifest.get('fingerprint') != self._chunks_fingerprint(chunks):
+                logger.info("Vector store fingerprint mismatch: documents or embedding model changed")
+                return True
+            
+            # Only open the store once the manifest says it is current
+            if CONFIG.VECTOR_BACKEND == 'faiss':
+                temp_db = FAISSVectorStore.load(self.embedding_model, CONFIG.CHROMA_PERSIST_DIR)
+            else:
+                temp_db = Chroma(
+                    persist_directory=CONFIG.CHROMA_PERSIST_DIR,
+                    embedding_function=self.embedding_model
+                )
+            
             # Store for use if no rebuild needed
             self.vector_db = temp_db
             return False
             
+        except FileNotFoundError:
+            logger.info("No vector store manifest found")
+            return True
+            
         except Exception as e:
             logger.warning(f"Error checking vector store: {e}")
             return True
     
+    def _chunks_fingerprint(self, chunks: List[Document]) -> str:
+        """Digest of the chunk texts, the embedding model and the backend storage"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{CONFIG.VECTOR_BACKEND}-{CONFIG.ANN_INDEX_TYPE}-{CONFIG.ANN_QUANTIZATION}:{self._embedding_signature()}".encode('utf-8'))
+        for chunk in chunks:
+            digest.update(EmbeddingCache.hash_text(chunk.page_content).encode('ascii'))
+        return digest.hexdigest()
+    
+    def _write_manifest(self, chunks: List[Document]):
+        """Record what the persisted store was built from"""
+        manifest = {'count': len(chunks), 'fingerprint': self._chunks_fingerprint(chunks)}
+        with open(os.path.join(CONFIG.CHROMA_PERSIST_DIR, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+    
     def _rebuild_vector_store(self, chunks: List[Document]) -> bool:
         """Rebuild the vector store from chunks"""
         try:
             logger.info("Rebuilding vector store")
             
-            # Clean up existing instance
-            if self.vector_db:
-                del self.vector_db
-                self.vector_db = None
-                gc.collect()
+            # Cached results point into the store being replaced
+            self.query_cache.clear()
+            
+            # Drop the old store; reference counting frees it without a full collection
+            self.vector_db = None
             
             # Remove existing data
             self._clean_vector_store_directory()
             
+            # Embed up front so the store ingests vectors instead of re-embedding
+            texts = [chunk.page_content for chunk in chunks]
+            metadatas = [chunk.metadata for chunk in chunks]
+            embeddings = self._embed_texts(texts)
+            
             # Create new store
-            self.vector_db = Chroma.from_documents(
-                documents=chunks,
-                embedding=self.embedding_model,
-                persist_directory=Config.CHROMA_PERSIST_DIR
-            )
+            if CONFIG.VECTOR_BACKEND == 'faiss':
+                self.vector_db = FAISSVectorStore.from_embeddings(
+                    texts=texts,
+                    embeddings=embeddings,
+                    metadatas=metadatas,
+                    embedding_function=self.embedding_model,
+                    persist_directory=CONFIG.CHROMA_PERSIST_DIR
+                )
+            else:
+                self.vector_db = Chroma(
+                    persist_directory=CONFIG.CHROMA_PERSIST_DIR,
+                    embedding_function=self.embedding_model
+                )
+                # Fixed-size batches keep each Chroma transaction small
+                batch_size = CONFIG.CHROMA_BATCH_SIZE
+                for start in range(0, len(texts), batch_size):
+                    end = start + batch_size
+                    self.vector_db._collection.add(
+                        ids=[str(uuid4()) for _ in texts[start:end]],
+                        embeddings=embeddings[start:end],
+                        metadatas=metadatas[start:end],
+                        documents=texts[start:end]
+                    )
+            
+            # Written last, so an interrupted rebuild is never trusted
+            self._write_manifest(chunks)
             
             logger.info(f"Vector store rebuilt with {len(chunks)} chunks")
             return True
@@ -161,25 +376,60 @@ class RAGService:
             logger.error(f"Error rebuilding vector store: {e}")
             return False
     
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, reusing cached vectors for chunks seen before"""
+        if not self.embedding_cache:
+            return self._embed_batched(texts)
+        
+        keys = [EmbeddingCache.hash_text(text) for text in texts]
+        vectors = self.embedding_cache.get_many(keys)
+        
+        # Embed each distinct missing text once
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if missing:
+            new_vectors = dict(zip(missing, self._embed_batched(list(missing.values()))))
+            self.embedding_cache.put_many(new_vectors)
+            vectors.update(new_vectors)
+        
+        logger.info(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+        return [vectors[key] for key in keys]
+    
+    def _embed_batched(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in length-sorted batches to minimize padding waste"""
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batch_size = CONFIG.EMBEDDING_BATCH_SIZE
+        
+        for start in range(0, len(order), batch_size):
+            batch_indices = order[start:start + batch_size]
+            vectors = self.embedding_model.embed_documents([texts[i] for i in batch_indices])
+            
+            for i, vector in zip(batch_indices, vectors):
+                embeddings[i] = vector
+        
+        logger.info(f"Embedded {len(texts)} chunks in batches of {batch_size}")
+        return embeddings
+    
     def _clean_vector_store_directory(self):
         """Clean the vector store directory"""
-        if not os.path.exists(Config.CHROMA_PERSIST_DIR):
+        if not os.path.exists(CONFIG.CHROMA_PERSIST_DIR):
             return
         
-        for attempt in range(Config.MAX_REBUILD_ATTEMPTS):
+        for attempt in range(CONFIG.MAX_REBUILD_ATTEMPTS):
             try:
-                for item in os.listdir(Config.CHROMA_PERSIST_DIR):
-                    item_path = os.path.join(Config.CHROMA_PERSIST_DIR, item)
-                    if os.path.isdir(item_path):
-                        shutil.rmtree(item_path)
-                    else:
-                        os.unlink(item_path)
+                # Empty the directory but keep it, so symlinked or mounted roots keep working
+                with os.scandir(CONFIG.CHROMA_PERSIST_DIR) as entries:
+                    for entry in list(entries):
+                        if entry.is_dir(follow_symlinks=False):
+                            shutil.rmtree(entry.path, onerror=_retry_writable)
+                        else:
+                            os.unlink(entry.path)
                 break
                 
             except PermissionError as e:
                 logger.warning(f"Attempt {attempt + 1} to clean directory failed: {e}")
-                if attempt < Config.MAX_REBUILD_ATTEMPTS - 1:
-                    time.sleep(Config.RETRY_DELAY)
+                if attempt < CONFIG.MAX_REBUILD_ATTEMPTS - 1:
+                    time.sleep(CONFIG.RETRY_DELAY)
                 else:
                     logger.error("Failed to clean vector store directory")
                     
@@ -194,7 +444,7 @@ class RAGService:
             return "", []
         
         if k is None:
-            k = Config.DEFAULT_K_RETRIEVAL
+            k = CONFIG.DEFAULT_K_RETRIEVAL
         
         try:
             # Validate input
@@ -203,35 +453,177 @@ class RAGService:
                 logger.warning(f"Invalid search query: {error_msg}")
                 return "", []
             
+            cache_key = QueryCache.make_key(query, k)
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                concatenated_content, sources = cached
+                logger.info(f"Serving cached search results: query='{query[:50]}...', k={k}")
+                return concatenated_content, list(sources)
+            
             logger.info(f"Searching for similar documents: query='{query[:50]}...', k={k}")
             
-            similar_docs = self.vector_db.similarity_search_with_score(query, k=k)
+            # Embed once; the vector drives both the search and sentence ranking
+            query_vector = self.embedding_model.embed_query(query)
+            similar_docs = self.vector_db.similarity_search_by_vector_with_relevance_scores(query_vector, k=k)
             
             if not similar_docs:
                 logger.info("No similar documents found")
-                return "", []
-            
-            # Extract content and sources
-            contents = []
-            sources = []
-            
-            for doc, score in similar_docs:
-                contents.append(doc.page_content)
-                sources.append(DocumentSource(
-                    source_file=doc.metadata.get('source_file', 'Unknown'),
-                    page=str(doc.metadata.get('page', 'N/A')),
-                    score=float(f"{score:.4f}")
-                ))
-            
-            concatenated_content = "\n\n---\n\n".join(contents)
+            else:
+                logger.info(f"Found {len(similar_docs)} similar documents")
             
-            logger.info(f"Found {len(similar_docs)} similar documents")
+            concatenated_content, sources = self._format_results(similar_docs, query_vector)
+            self.query_cache.put(cache_key, (concatenated_content, tuple(sources)))
             return concatenated_content, sources
             
         except Exception as e:
             logger.error(f"Error searching similar documents: {e}")
             return "", []
     
+    def search_similar_documents_batch(self, queries: List[str], k: int = None) -> List[Tuple[str, List[DocumentSource]]]:
+        """
+        Search for several queries at once.
+        
+        Cached and repeated queries are resolved without searching; the rest are
+        embedded in one batched forward pass and searched in parallel.
+        
+        Args:
+            queries: Query strings
+            k: Number of documents per query
+            
+        Returns:
+            List of (context, sources) tuples, in the order of queries
+        """
+        results: List[Optional[Tuple[str, List[DocumentSource]]]] = [None] * len(queries)
+        
+        if not self.vector_db:
+            logger.error("Vector database not initialized")
+            return [("", []) for _ in queries]
+        
+        if k is None:
+            k = CONFIG.DEFAULT_K_RETRIEVAL
+        
+        # Cache key -> positions in queries, so duplicates are searched once
+        pending: Dict[str, List[int]] = {}
+        
+        for i, query in enumerate(queries):
+            is_valid, error_msg = validate_input(query)
+            if not is_valid:
+                logger.warning(f"Invalid search query: {error_msg}")
+                results[i] = ("", [])
+                continue
+            
+            cache_key = QueryCache.make_key(query, k)
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                results[i] = (cached[0], list(cached[1]))
+            else:
+                pending.setdefault(cache_key, []).append(i)
+        
+        if pending:
+            try:
+                logger.info(f"Batch searching {len(pending)} of {len(queries)} queries, k={k}")
+                
+                vectors = self.embedding_model.embed_documents(
+                    [queries[positions[0]] for positions in pending.values()]
+                )
+                searches = self._search_pool.map(
+                    lambda vector: self.vector_db.similarity_search_by_vector_with_relevance_scores(vector, k=k),
+                    vectors
+                )
+                
+                for (cache_key, positions), vector, similar_docs in zip(pending.items(), vectors, searches):
+                    concatenated_content, sources = self._format_results(similar_docs, vector)
+                    self.query_cache.put(cache_key, (concatenated_content, tuple(sources)))
+                    for i in positions:
+                        results[i] = (concatenated_content, list(sources))
+                
+            except Exception as e:
+                logger.error(f"Error in batch document search: {e}")
+        
+        return [result if result is not None else ("", []) for result in results]
+    
+    def _format_results(self, similar_docs: List[Tuple[Document, float]],
+                        query_vector: Optional[List[float]] = None) -> Tuple[str, List[DocumentSource]]:
+        """
+        Concatenate retrieved chunks and describe their sources.
+        
+        Chunks are condensed to their most query-relevant sentences and the
+        context is cut at CONTEXT_MAX_TOKENS; chunks past the budget are dropped.
+        
+        Args:
+            similar_docs: (document, distance) pairs, best first
+            query_vector: Embedding of the query, used to rank sentences
+            
+        Returns:
+            Tuple of (context, sources)
+        """
+        contents = []
+        sources = []
+        budget = CONFIG.CONTEXT_MAX_TOKENS
+        
+        for (doc, score), content in zip(similar_docs, self._condense_contents(similar_docs, query_vector)):
+            if budget <= 0:
+                break
+            
+            content, token_count = truncate_by_tokens(content, budget, CONFIG.TOKENIZER_ENCODING)
+            budget -= token_count
+            
+            contents.append(content)
+            sources.append(DocumentSource(
+                source_file=doc.metadata.get('source_file', 'Unknown'),
+                page=str(doc.metadata.get('page', 'N/A')),
+                score=float(f"{score:.4f}")
+            ))
+        
+        return "\n\n---\n\n".join(contents), sources
+    
+    def _condense_contents(self, similar_docs: List[Tuple[Document, float]],
+                           query_vector: Optional[List[float]]) -> List[str]:
+        """Keep the CONTEXT_SENTENCES_PER_DOC sentences of each chunk closest to the query"""
+        per_doc = CONFIG.CONTEXT_SENTENCES_PER_DOC
+        contents = [doc.page_content for doc, _ in similar_docs]
+        
+        if per_doc <= 0 or query_vector is None:
+            return contents
+        
+        try:
+            return self._rank_sentences(contents, query_vector, per_doc)
+        except Exception as e:
+            # Condensing only trims the context; whole chunks are still a valid answer
+            logger.warning(f"Sentence ranking failed, using whole chunks: {e}")
+            return contents
+    
+    def _rank_sentences(self, contents: List[str], query_vector: List[float], per_doc: int) -> List[str]:
+        """Return a copy of contents with long chunks cut to their per_doc best sentences"""
+        contents = list(contents)
+        
+        # Only chunks with more sentences than the limit need ranking
+        sentence_lists = [split_sentences(content) for content in contents]
+        to_rank = [i for i, sentences in enumerate(sentence_lists) if len(sentences) > per_doc]
+        if not to_rank:
+            return contents
+        
+        # Embed every candidate sentence in one batch and score by cosine similarity
+        vectors = np.asarray(
+            self.embedding_model.embed_documents([s for i in to_rank for s in sentence_lists[i]]),
+            dtype=np.float32
+        )
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        query = np.asarray(query_vector, dtype=np.float32)
+        scores = vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        
+        offset = 0
+        for i in to_rank:
+            sentences = sentence_lists[i]
+            doc_scores = scores[offset:offset + len(sentences)]
+            offset += len(sentences)
+            
+            # Top sentences, kept in their original order
+            keep = np.sort(np.argpartition(-doc_scores, per_doc)[:per_doc])
+            contents[i] = ' '.join(sentences[j] for j in keep.tolist())
+        
+        return contents
+    
     def generate_response(self, query: str, context: str = "") -> Tuple[str, ChatMode]:
         """Generate response using LLM"""
         if not self.llm:
@@ -243,14 +635,7 @@ class RAGService:
             if not is_valid:
                 return f"Invalid input: {error_msg}", ChatMode.UNAVAILABLE
             
-            if context:
-                # RAG mode with context
-                prompt = self._create_rag_prompt(query, context)
-                mode = ChatMode.RAG
-            else:
-                # LLM only mode
-                prompt = query
-                mode = ChatMode.LLM_ONLY
+            prompt, mode = self._build_prompt(query, context)
             
             logger.info(f"Generating response with {mode.value} mode")
             
@@ -263,27 +648,49 @@ class RAGService:
             logger.error(f"Error generating response: {e}")
             return "Sorry, an error occurred while generating the response", ChatMode.UNAVAILABLE
     
+    def generate_response_stream(self, query: str, context: str = "") -> Iterator[Tuple[str, ChatMode]]:
+        """
+        Generate a response using the LLM, yielding text as it arrives.
+        
+        Args:
+            query: User question
+            context: Retrieved document context (empty for LLM-only mode)
+            
+        Yields:
+            (text piece, mode) tuples; failures yield a single message with ChatMode.UNAVAILABLE
+        """
+        if not self.llm:
+            yield "LLM not available", ChatMode.UNAVAILABLE
+            return
+        
+        # Validate input
+        is_valid, error_msg = validate_input(query)
+        if not is_valid:
+            yield f"Invalid input: {error_msg}", ChatMode.UNAVAILABLE
+            return
+        
+        prompt, mode = self._build_prompt(query, context)
+        
+        logger.info(f"Streaming response with {mode.value} mode")
+        
+        try:
+            for chunk in self.llm.stream(prompt):
+                if chunk.content:
+                    yield chunk.content, mode
+                    
+        except Exception as e:
+            logger.error(f"Error streaming response: {e}")
+            yield "Sorry, an error occurred while generating the response", ChatMode.UNAVAILABLE
+    
+    def _build_prompt(self, query: str, context: str) -> Tuple[str, ChatMode]:
+        """Pick the prompt and mode: RAG when context was retrieved, LLM-only otherwise"""
+        if context:
+            return self._create_rag_prompt(query, context), ChatMode.RAG
+        return query, ChatMode.LLM_ONLY
+    
     def _create_rag_prompt(self, query: str, context: str) -> str:
         """Create RAG prompt with instructions"""
-        return f"""You are a helpful assistant with access to specific document context. Follow these guidelines:
-
-1. **PRIMARY PRIORITY**: Use the information from the provided CONTEXT below to answer the question.
-2. **SECONDARY PRIORITY**: If the context doesn't contain sufficient information, you may supplement with your general knowledge, but clearly indicate when you're doing so.
-3. **TRANSPARENCY**: Always specify your sources:
-   - For context-based info: "According to the provided documents..." or "Based on the context..."
-   - For general knowledge: "Based on general knowledge..." or "Generally speaking..."
-4. **ACCURACY**: Be factual and helpful. Don't make up specific details not found in either source.
-5. **COMPLETENESS**: Provide comprehensive answers when possible.
-
-CONTEXT FROM DOCUMENTS:
---- start of context ---
-{context}
---- end of context ---
-
-QUESTION:
-{query}
-
-HELPFUL RESPONSE (prioritizing context, supplementing with general knowledge when needed):"""
+        return _RAG_TEMPLATE.format_map({'context': context, 'query': query})
     
     def is_available(self) -> bool:
         """Check if RAG service is available"""
@@ -295,17 +702,23 @@ HELPFUL RESPONSE (prioritizing context, supplementing with general knowledge whe
     
     def clear(self):
         """Clear all components"""
-        if self.vector_db:
-            del self.vector_db 
-            self.vector_db = None
+        self.query_cache.clear()
+        self._search_pool.shutdown(wait=False)
         
-        if self.embedding_model:
-            del self.embedding_model
-            self.embedding_model = None
-            
-        if self.llm:
-            del self.llm
-            self.llm = None
+        self.vector_db = None
+        self.embedding_model = None
+        self.llm = None
+        
+        if self.http_client:
+            self.http_client.close()
+            self.http_client = None
+        
+        if self.embedding_cache:
+            self.embedding_cache.close()
+            self.embedding_cache = None
             
         self.is_ready = False
-        gc.collect() 
\ No newline at end of file
+        
+        # Only pay for a full collection when enough long-lived objects have piled up
+        if gc.get_count()[2] >= gc.get_threshold()[2]:
+            gc.collect() 
\ No newline at end of file
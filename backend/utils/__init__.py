@@ -1,14 +1,24 @@
 # Utils package
 from .text_processing import (
     normalize_text,
+    normalize_texts,
     validate_input,
     sanitize_filename,
-    chunk_text
+    chunk_text,
+    chunk_text_by_tokens,
+    split_sentences,
+    truncate_by_tokens
 )
+from .json_provider import OrjsonProvider
 
 __all__ = [
     'normalize_text',
+    'normalize_texts',
     'validate_input',
     'sanitize_filename',
-    'chunk_text'
+    'chunk_text',
+    'chunk_text_by_tokens',
+    'split_sentences',
+    'truncate_by_tokens',
+    'OrjsonProvider'
 ] 
\ No newline at end of file
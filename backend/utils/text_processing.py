@@ -1,5 +1,26 @@
 import re
-from typing import List, Any
+from typing import List, Any, Tuple
+import numpy as np
+import tiktoken
+
+# Deletion table for control chars \x00-\x08, \x0b, \x0c, \x0e-\x1f and \x7f-\x9f
+_CONTROL_CHARS_TABLE = dict.fromkeys(
+    [*range(0x00, 0x09), 0x0b, 0x0c, *range(0x0e, 0x20), *range(0x7f, 0xa0)]
+)
+_UNSAFE_FILENAME_RE = re.compile(r'[^a-zA-Z0-9._-]')
+_SENTENCE_BOUNDARY_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Potential injection patterns, combined so input is scanned once
+_SUSPICIOUS_PATTERNS = [
+    r'<script.*?>.*?</script>',
+    r'javascript:',
+    r'on\w+\s*=',
+    r'data:text/html',
+]
+_SUSPICIOUS_RE = re.compile('|'.join(f'(?:{p})' for p in _SUSPICIOUS_PATTERNS), re.IGNORECASE)
+
+# Private-use character: neither whitespace nor a control char, so normalize_text keeps it
+_TEXT_SEPARATOR = '\ue000'
 
 def normalize_text(text: str) -> str:
     """
@@ -14,18 +35,38 @@ def normalize_text(text: str) -> str:
     if not isinstance(text, str):
         return ""
     
-    # Remove excessive whitespace and normalize
-    text = re.sub(r'\s+', ' ', text).strip()
-    
-    # Remove hyphenated line breaks
-    text = re.sub(r'-\n', '', text)
+    # Collapse whitespace runs (newlines included) to single spaces and strip,
+    # in one C-level split/join pass
+    text = ' '.join(text.split())
     
     # Remove other common PDF artifacts
-    text = re.sub(r'\n+', '\n', text)  # Multiple newlines to single
-    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)  # Control chars
+    text = text.translate(_CONTROL_CHARS_TABLE)  # Control chars
     
     return text
 
+def normalize_texts(texts: List[str]) -> List[str]:
+    """
+    Normalize many texts (e.g. the pages of a PDF) in one pass.
+    
+    The texts are joined with a separator that normalize_text leaves intact,
+    normalized together and split back, so the normalization passes run once per
+    batch instead of once per text.
+    
+    Args:
+        texts: Raw texts to normalize
+        
+    Returns:
+        Cleaned texts, in the same order
+    """
+    if not texts:
+        return []
+    
+    joined = _TEXT_SEPARATOR.join(
+        text.replace(_TEXT_SEPARATOR, '') if isinstance(text, str) else ''
+        for text in texts
+    )
+    return [part.strip() for part in normalize_text(joined).split(_TEXT_SEPARATOR)]
+
 def validate_input(text: str, max_length: int = 5000) -> tuple[bool, str]:
     """
     Validate user input for safety and length.
@@ -48,17 +89,14 @@ def validate_input(text: str, max_length: int = 5000) -> tuple[bool, str]:
     if len(text) > max_length:
         return False, f"Input too long (max {max_length} characters)"
     
-    # Check for potential injection patterns
-    suspicious_patterns = [
-        r'<script.*?>.*?</script>',
-        r'javascript:',
-        r'on\w+\s*=',
-        r'data:text/html',
-    ]
+    # Every suspicious pattern needs one of these characters; plain prose
+    # has none of them and skips the regex scan
+    if '<' not in text and ':' not in text and '=' not in text:
+        return True, ""
     
-    for pattern in suspicious_patterns:
-        if re.search(pattern, text, re.IGNORECASE):
-            return False, "Input contains suspicious content"
+    # Check for potential injection patterns
+    if _SUSPICIOUS_RE.search(text):
+        return False, "Input contains suspicious content"
     
     return True, ""
 
@@ -66,6 +104,10 @@ def sanitize_filename(filename: str) -> str:
     """
     Sanitize filename for safe storage.
     
+    Path separators are deleted rather than stripped with basename, so
+    names like model ids ("org/model") stay distinct and stable across
+    releases; cache directories and document sources are keyed on them.
+    
     Args:
         filename: Original filename
         
@@ -79,7 +121,7 @@ def sanitize_filename(filename: str) -> str:
     filename = filename.replace('..', '').replace('/', '').replace('\\', '')
     
     # Keep only alphanumeric, dots, hyphens, and underscores
-    filename = re.sub(r'[^a-zA-Z0-9._-]', '_', filename)
+    filename = _UNSAFE_FILENAME_RE.sub('_', filename)
     
     # Ensure it's not empty
     if not filename:
@@ -102,20 +144,93 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[st
     if not text or chunk_size <= 0:
         return []
     
-    chunks = []
-    start = 0
+    text_length = len(text)
+    step = max(chunk_size - overlap, 1)
+    
+    # All window offsets at once; stop after the first window reaching the end
+    starts = np.arange(0, text_length, step)
+    starts = starts[np.concatenate(([True], starts[:-1] + chunk_size < text_length))]
+    ends = np.minimum(starts + chunk_size, text_length)
+    
+    return [
+        chunk
+        for start, end in zip(starts.tolist(), ends.tolist())
+        if not (chunk := text[start:end]).isspace()
+    ]
+
+def chunk_text_by_tokens(text: str, chunk_size: int = 250, overlap: int = 50,
+                         encoding_name: str = "cl100k_base") -> List[Tuple[int, str]]:
+    """
+    Split text into windows of tokens using tiktoken's BPE tokenizer.
+    
+    The text is encoded once; windows are cut on token boundaries and mapped
+    back to character offsets, so chunks are slices of the original text.
+    
+    Args:
+        text: Text to chunk
+        chunk_size: Size of each chunk in tokens
+        overlap: Overlap between chunks in tokens
+        encoding_name: tiktoken encoding to use
+        
+    Returns:
+        List of (start_index, chunk) tuples, start_index being a character offset
+    """
+    if not text or chunk_size <= 0:
+        return []
+    
+    encoding = tiktoken.get_encoding(encoding_name)
+    tokens = encoding.encode(text, disallowed_special=())
+    if not tokens:
+        return []
+    
+    decoded, offsets = encoding.decode_with_offsets(tokens)
+    token_count = len(tokens)
+    step = max(chunk_size - overlap, 1)
     
-    while start < len(text):
-        end = min(start + chunk_size, len(text))
-        chunk = text[start:end]
+    chunks = []
+    for start in range(0, token_count, step):
+        end = min(start + chunk_size, token_count)
+        char_start = offsets[start]
+        char_end = offsets[end] if end < token_count else len(decoded)
         
+        chunk = decoded[char_start:char_end]
         if chunk.strip():
-            chunks.append(chunk)
-        
-        start = end - overlap if overlap > 0 else end
+            chunks.append((char_start, chunk))
         
-        # Prevent infinite loop
-        if start >= end:
+        if end == token_count:
             break
     
-    return chunks 
\ No newline at end of file
+    return chunks
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text into sentences on terminal punctuation followed by whitespace.
+    
+    Args:
+        text: Text to split
+        
+    Returns:
+        List of non-empty sentences
+    """
+    return [sentence for sentence in _SENTENCE_BOUNDARY_RE.split(text.strip()) if sentence]
+
+def truncate_by_tokens(text: str, max_tokens: int,
+                       encoding_name: str = "cl100k_base") -> Tuple[str, int]:
+    """
+    Cut text to at most max_tokens tokens of a tiktoken encoding.
+    
+    Args:
+        text: Text to truncate
+        max_tokens: Maximum number of tokens to keep
+        encoding_name: tiktoken encoding to use
+        
+    Returns:
+        (text, token_count) tuple, text being unchanged when it already fits
+    """
+    encoding = tiktoken.get_encoding(encoding_name)
+    tokens = encoding.encode(text, disallowed_special=())
+    
+    if len(tokens) <= max_tokens:
+        return text, len(tokens)
+    
+    return encoding.decode(tokens[:max_tokens]), max_tokens